@@ -1,135 +1,487 @@
-import os, json, re, time
+import os, json, re, asyncio, pickle, hashlib, html as htmllib
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+import aiohttp
+from aiolimiter import AsyncLimiter
+from selectolax.lexbor import LexborHTMLParser
 import yaml
 
+try:  # parser YAML em C (libyaml), se disponível
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+try:  # serialização JSON rápida (Rust); fallback para json da stdlib
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # opcional: pip install google-re2 (matching em tempo linear, sem backtracking)
+    import re2
+except ImportError:
+    re2 = None
+
 STATE_FILE = Path("data/state.json")
 CONFIG_FILE = Path("config/mauser.yaml")
+CONFIG_CACHE = Path("config/mauser.yaml.cache.pkl")  # config já processada (regex compiladas)
+CONFIG_CACHE_VERSION = 3  # incrementar se mudar o formato gerado por compile_patterns
 
 DISCORD_WEBHOOK = os.getenv("DISCORD_WEBHOOK_URL")
 MAUSER_USER = os.getenv("MAUSER_USERNAME")
 MAUSER_PASS = os.getenv("MAUSER_PASSWORD")
 
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (compatible; WyzincPriceWatcher/1.0; +https://wyzinc.pt)"
+    "User-Agent": "Mozilla/5.0 (compatible; WyzincPriceWatcher/1.0; +https://wyzinc.pt)",
+    "Connection": "keep-alive",
+    "Accept-Encoding": "gzip, deflate, br",  # br requer o pacote Brotli
 }
 
+TIMEOUT = aiohttp.ClientTimeout(total=60)
+CONCURRENCY = 8  # máx. de produtos a ler em simultâneo
+POOL_SIZE = 32   # ligações mantidas abertas (keep-alive) no connector
+DNS_TTL = 300    # segundos em cache no connector
+MIN_INTERVAL = 1.0  # segundos entre pedidos ao mesmo host (config: min_interval)
+
+# retry com backoff exponencial (equivalente ao urllib3 Retry)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_AFTER_MAX = 60  # Retry-After acima disto: desistir em vez de esperar
+
+# fallback regex_full_html: com `anchor` definido, só corre numa janela à volta dela
+ANCHOR_BEFORE = 256
+ANCHOR_AFTER = 4096
+
+# leitura da resposta por blocos, com limite de tamanho
+MAX_BYTES = 512 * 1024  # por omissão; config: max_bytes
+CHUNK_SIZE = 64 * 1024
+# parar cedo fecha a ligação (não volta ao pool keep-alive) e o próximo pedido
+# ao host paga novo TCP+TLS; só compensa se ainda faltar ler bastante
+EARLY_STOP_MIN_SAVING = 128 * 1024
+
+DISCORD_LIMIT = 2000  # máx. de caracteres por mensagem do webhook
+DISCORD_INTERVAL = 1.0  # pausa entre partes de uma mensagem (rate limit do webhook)
+
+# cookies de sessão Magento que, se criados/renovados pelo POST de login, confirmam o login
+AUTH_COOKIES = ("customer", "frontend", "PHPSESSID")
+
+def compile_regex(pattern: str, flags: int = 0, engine: str | None = None):
+    """re.compile, ou re2.compile se `engine: re2` e google-re2 estiver instalado."""
+    if engine == "re2":
+        if re2 is not None:
+            inline = ("i" if flags & re.IGNORECASE else "") + ("s" if flags & re.DOTALL else "")
+            return re2.compile(f"(?{inline}){pattern}" if inline else pattern)
+        print("[WARN] engine: re2 pedido mas google-re2 não está instalado; a usar re.")
+    return re.compile(pattern, flags)
+
+def config_fingerprint(pconf: dict) -> str:
+    """Hash da config de extração (price/stock) do produto, sem as chaves internas `_*`."""
+    spec = {key: {k: v for k, v in (pconf.get(key) or {}).items() if not k.startswith("_")}
+            for key in ("price", "stock")}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def compile_patterns(cfg: dict):
+    """Compila uma vez as regex de cada produto (chaves `_regex`/`_regex_full_html`)."""
+    for p in cfg.get("products") or []:
+        for key in ("price", "stock"):
+            section = p.get(key) or {}
+            # selector normalizado: o mesmo texto reaproveita o cache por página
+            section["selector"] = (section.get("selector") or "").strip() or None
+            rx = section.get("regex")
+            rx_full = section.get("regex_full_html")
+            engine = section.get("engine")
+            section["_regex"] = compile_regex(rx, engine=engine) if rx else None
+            section["_regex_full_html"] = compile_regex(rx_full, re.IGNORECASE | re.DOTALL, engine) if rx_full else None
+            p[key] = section
+        p["_fingerprint"] = config_fingerprint(p)
+    return cfg
+
 def load_config():
+    """Lê a config; reaproveita o cache em pickle enquanto o YAML, este script
+    e CONFIG_CACHE_VERSION não mudarem (o formato vem de compile_patterns)."""
+    key = (CONFIG_CACHE_VERSION, os.stat(CONFIG_FILE).st_mtime_ns, os.stat(__file__).st_mtime_ns)
+    if CONFIG_CACHE.exists():
+        try:
+            with open(CONFIG_CACHE, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("key") == key:
+                return cached["cfg"]
+        except Exception as e:
+            print("[WARN] Cache de config inválido, a reler YAML:", e)
+
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        cfg = compile_patterns(yaml.load(f, Loader=SafeLoader))
+    try:
+        with open(CONFIG_CACHE, "wb") as f:
+            pickle.dump({"key": key, "cfg": cfg}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:  # ex.: padrões re2 não serializáveis
+        CONFIG_CACHE.unlink(missing_ok=True)
+        print("[WARN] Não foi possível gravar cache de config:", e)
+    return cfg
 
 def load_state():
     if STATE_FILE.exists():
+        if orjson is not None:
+            return orjson.loads(STATE_FILE.read_bytes())
         with open(STATE_FILE, "r", encoding="utf-8") as f:
             return json.load(f)
     return {}
 
 def save_state(state):
     STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    if orjson is not None:
+        STATE_FILE.write_bytes(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     with open(STATE_FILE, "w", encoding="utf-8") as f:
         json.dump(state, f, ensure_ascii=False, indent=2)
 
-def send_discord_message(content: str):
+def retry_after_seconds(r: aiohttp.ClientResponse, default: float) -> float | None:
+    """Maior entre `default` e o Retry-After (em segundos) da resposta, ou None
+    se o servidor pedir mais de RETRY_AFTER_MAX (não compensa esperar)."""
+    try:
+        delay = max(default, float(r.headers.get("Retry-After", "")))
+    except ValueError:
+        delay = default
+    return delay if delay <= RETRY_AFTER_MAX else None
+
+async def get_with_retry(session: aiohttp.ClientSession, url: str, **kwargs):
+    """GET com até RETRY_TOTAL tentativas extra em erros de ligação/timeout
+    ou status em RETRY_STATUS. Devolve a resposta (usar com `async with`)."""
+    for attempt in range(RETRY_TOTAL + 1):
+        last = attempt == RETRY_TOTAL
+        delay = RETRY_BACKOFF * (2 ** attempt)
+        try:
+            r = await session.get(url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last:
+                raise
+        else:
+            if r.status not in RETRY_STATUS or last:
+                return r
+            delay = retry_after_seconds(r, delay)
+            if delay is None:
+                return r  # Retry-After demasiado longo: o chamador vê o erro
+            r.release()
+        await asyncio.sleep(delay)
+
+def make_resolver():
+    """AsyncResolver (aiodns/c-ares) se disponível; senão o resolver por threads."""
+    try:
+        return aiohttp.AsyncResolver()
+    except (RuntimeError, ImportError):
+        return aiohttp.ThreadedResolver()
+
+async def warm_dns(connector: aiohttp.TCPConnector, urls, skip_hosts=()):
+    """Pré-resolve em paralelo os hosts dos URLs para o cache DNS do connector,
+    para que o primeiro pedido a cada host não pague a resolução. Hosts em
+    `skip_hosts` (ex.: o do login, já a ser resolvido) ficam de fora."""
+    targets = set()
+    for url in urls:
+        u = urlparse(url)
+        if u.hostname and u.hostname not in skip_hosts:
+            targets.add((u.hostname, u.port or (443 if u.scheme == "https" else 80)))
+    # API privada: _resolve_host(host, port, traces=None) do aiohttp 3.10.x (versão fixada
+    # em requirements.txt); a assinatura muda entre minors, rever ao atualizar o aiohttp
+    results = await asyncio.gather(*(connector._resolve_host(h, port) for h, port in targets),
+                                   return_exceptions=True)
+    for (h, _), res in zip(targets, results):
+        if isinstance(res, Exception):
+            print(f"[WARN] DNS falhou para {h}: {res}")
+
+async def read_limited(r: aiohttp.ClientResponse, anchors: list[bytes] | None = None,
+                       max_bytes: int = MAX_BYTES) -> tuple[str, str | None]:
+    """Lê o corpo por blocos até max_bytes (avisa se cortar). Se houver âncoras,
+    pára assim que todas estiverem no buffer com ANCHOR_AFTER bytes de contexto
+    a seguir, desde que o resto por ler compense perder a ligação keep-alive.
+    Devolve (html, motivo do corte: "max_bytes"/"early_stop"/None)."""
+    # sem compressão, o Content-Length diz quanto falta; com compressão ou
+    # chunked não se sabe, e assume-se que parar cedo compensa
+    length = r.content_length if not r.headers.get("Content-Encoding") else None
+    buf = bytearray()
+    truncated = None
+    found = {}  # âncora -> posição no buffer
+    overlap = max((len(a) for a in anchors or ()), default=0)
+    async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+        start = max(0, len(buf) - overlap)
+        buf.extend(chunk)
+        if len(buf) >= max_bytes:
+            if len(buf) > max_bytes or not r.content.at_eof():
+                print(f"[WARN] {r.url}: página cortada em {max_bytes} bytes (max_bytes); "
+                      "selectors depois desse ponto não são encontrados.")
+                truncated = "max_bytes"
+            del buf[max_bytes:]
+            break
+        if anchors:
+            for a in anchors:
+                if a not in found:
+                    idx = buf.find(a, start)
+                    if idx != -1:
+                        found[a] = idx
+            if len(found) == len(anchors) and all(len(buf) >= i + ANCHOR_AFTER for i in found.values()):
+                if length is None or length - len(buf) >= EARLY_STOP_MIN_SAVING:
+                    truncated = "early_stop"
+                    break
+                anchors = None  # falta pouco: lê até ao fim e a ligação volta ao pool
+    return buf.decode(r.charset or "utf-8", errors="replace"), truncated
+
+def early_stop_anchors(pconfs: list[dict]) -> list[bytes] | None:
+    """Âncoras que permitem parar a leitura cedo de uma página partilhada por
+    `pconfs`. Só campos extraídos apenas por regex_full_html com `anchor` o
+    permitem; um selector (pode estar em qualquer ponto do documento) ou um
+    regex_full_html sem âncora obrigam a ler a página toda (até max_bytes)."""
+    anchors = []
+    for pconf in pconfs:
+        for key in ("price", "stock"):
+            section = pconf.get(key) or {}
+            if section.get("selector"):
+                return None
+            if not section.get("regex_full_html"):
+                continue
+            anchor = section.get("anchor")
+            if not anchor:
+                return None
+            if anchor.encode("utf-8") not in anchors:
+                anchors.append(anchor.encode("utf-8"))
+    return anchors or None
+
+def split_message(content: str, limit: int = DISCORD_LIMIT) -> list[str]:
+    """Parte o conteúdo em mensagens <= limit, preferindo cortar entre blocos (\\n\\n)."""
+    parts, current = [], ""
+    for block in content.split("\n\n"):
+        while len(block) > limit:  # bloco sozinho acima do limite: corte direto
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(block[:limit])
+            block = block[limit:]
+        if not current:
+            current = block
+        elif len(current) + 2 + len(block) <= limit:
+            current = "\n\n".join((current, block))
+        else:
+            parts.append(current)
+            current = block
+    if current:
+        parts.append(current)
+    return parts
+
+async def send_discord_message(session: aiohttp.ClientSession, content: str):
     if not DISCORD_WEBHOOK:
         print("[WARN] DISCORD_WEBHOOK_URL não definido. Mensagem:", content)
         return
-    try:
-        r = requests.post(DISCORD_WEBHOOK, json={"content": content}, timeout=30)
-        r.raise_for_status()
-    except Exception as e:
-        print("[ERROR] Falha ao enviar para Discord:", e)
+    parts = split_message(content)
+    for i, part in enumerate(parts, 1):
+        if i > 1:
+            await asyncio.sleep(DISCORD_INTERVAL)
+        # cada parte é independente: uma falha não impede o envio das seguintes
+        for attempt in range(RETRY_TOTAL + 1):
+            delay = None
+            try:
+                async with session.post(DISCORD_WEBHOOK, json={"content": part},
+                                        timeout=aiohttp.ClientTimeout(total=30)) as r:
+                    if r.status == 429 and attempt < RETRY_TOTAL:
+                        delay = retry_after_seconds(r, RETRY_BACKOFF * (2 ** attempt))
+                    if delay is None:
+                        r.raise_for_status()
+            except Exception as e:
+                print(f"[ERROR] Falha ao enviar para Discord (parte {i}/{len(parts)}):", e)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
 
-def get_hidden_inputs(soup: BeautifulSoup):
+# (?<![\w-]) evita apanhar data-name=/data-value=/data-type=
+_HIDDEN_RX = re.compile(r'''<input\b[^>]*(?<![\w-])type\s*=\s*["']?hidden\b[^>]*>''', re.I)
+_ATTR_RX = re.compile(r'''(?<![\w-])(name|value)\s*=\s*(?:(["'])(.*?)\2|([^\s>"']+))''', re.I | re.S)
+
+def get_hidden_inputs(html: str):
     data = {}
-    for inp in soup.select("input[type=hidden]"):
-        name = inp.get("name")
-        val = inp.get("value", "")
+    for m in _HIDDEN_RX.finditer(html):
+        attrs = {}
+        for k, quote, quoted, bare in _ATTR_RX.findall(m.group(0)):
+            attrs.setdefault(k.lower(), htmllib.unescape(quoted if quote else bare))  # fica a 1.ª ocorrência
+        name = attrs.get("name")
+        val = attrs.get("value", "")
         if name:
             data[name] = val
     return data
 
-def login_mauser(session: requests.Session, cfg: dict):
+def auth_cookie_values(session: aiohttp.ClientSession, names) -> dict:
+    return {c.key: c.value for c in session.cookie_jar if c.value and c.key in names}
+
+async def login_mauser(session: aiohttp.ClientSession, cfg: dict):
     """Login heurístico.
     NOTA: a Mauser pode usar nomes de campos diferentes.
     Deixamos placeholders e validamos na prática (ajusto depois se necessário)."""
     login_cfg = cfg["login"]
 
     # 1) GET login page
-    r = session.get(login_cfg["login_page"], headers=HEADERS, timeout=60)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
-    payload = get_hidden_inputs(soup)
+    async with await get_with_retry(session, login_cfg["login_page"], headers=HEADERS, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        html = await r.text()
+    payload = get_hidden_inputs(html)
 
     # 2) preencher user e pass (placeholders)
     payload[login_cfg["user_field"]] = MAUSER_USER
     payload[login_cfg["pass_field"]] = MAUSER_PASS
 
     # 3) POST login (se a página usar outro endpoint, substituímos depois)
-    r2 = session.post(login_cfg["post_url"], data=payload, headers=HEADERS, timeout=60, allow_redirects=True)
-    r2.raise_for_status()
+    # (os cookies de sessão ficam no cookie jar da ClientSession)
+    auth_names = login_cfg.get("auth_cookies") or AUTH_COOKIES
+    before = auth_cookie_values(session, auth_names)
+    async with session.post(login_cfg["post_url"], data=payload, headers=HEADERS,
+                            timeout=TIMEOUT, allow_redirects=True) as r2:
+        r2.raise_for_status()
 
-    # 4) Verificação simples
-    check = session.get(login_cfg["login_page"], headers=HEADERS, timeout=60)
+    # 4) Verificação: o Magento cria/regenera o cookie de sessão no login,
+    # por isso um cookie de autenticação novo ou alterado dispensa outro GET
+    after = auth_cookie_values(session, auth_names)
+    if any(before.get(k) != v for k, v in after.items()):
+        print("[INFO] Login bem-sucedido (cookie de sessão).")
+        return True
+
+    async with session.get(login_cfg["login_page"], headers=HEADERS, timeout=TIMEOUT) as check:
+        body = (await check.read()).lower()
     # Se após login já não mostra o formulário, ou aparecer "minha conta" / "logout", assumimos ok
-    if any(s in check.text.lower() for s in ["minha conta", "logout", "sair"]):
+    if any(tok in body for tok in (b"minha conta", b"logout", b"sair")):
         print("[INFO] Login bem-sucedido.")
         return True
     print("[WARN] Não foi possível confirmar login (pode continuar visível sem login).")
     return True
 
-def extract_with_selector(soup: BeautifulSoup, selector: str, regex: str | None):
-    """Extrai por CSS selector (se existir) e aplica regex opcional."""
+def extract_with_selector(tree: LexborHTMLParser, selector: str, regex: re.Pattern | None,
+                          cache: dict | None = None):
+    """Extrai por CSS selector (se existir) e aplica regex opcional.
+    `cache` (por página) guarda o texto de cada selector já resolvido."""
     if not selector:
         return None
-    el = soup.select_one(selector)
-    if not el:
+    if cache is not None and selector in cache:
+        text = cache[selector]
+    else:
+        el = tree.css_first(selector)
+        text = el.text(strip=True) if el is not None else None
+        if cache is not None:
+            cache[selector] = text
+    if text is None:
         return None
-    text = el.get_text(strip=True)
     if regex:
-        m = re.search(regex, text)
+        m = regex.search(text)
         if m:
             return m.group(1)
     return text
 
-def extract_from_html(html: str, regex_full_html: str | None):
-    """Fallback: aplica regex diretamente ao HTML completo."""
+def extract_from_html(html: str, regex_full_html: re.Pattern | None, anchor: str | None = None):
+    """Fallback: aplica regex (já compilada com IGNORECASE|DOTALL) ao HTML.
+    Se a âncora existir na página, procura só numa janela à volta dela;
+    caso contrário (ou sem âncora) usa o HTML completo."""
     if not regex_full_html:
         return None
-    m = re.search(regex_full_html, html, flags=re.IGNORECASE | re.DOTALL)
+    if anchor:
+        idx = html.find(anchor)
+        if idx != -1:
+            html = html[max(0, idx - ANCHOR_BEFORE):idx + ANCHOR_AFTER]
+    m = regex_full_html.search(html)
     if m:
         return m.group(1)
     return None
 
+_PRICE_DROP = str.maketrans({"€": None, " ": None, "\u00a0": None, ".": None, ",": "."})
+_NUM_RX = re.compile(r"[+-]?\d+(?:\.\d+)?")
+
 def normalize_price(val: str | None):
     if not val:
         return None
-    v = val.replace("€", "").replace(" ", "").replace("\u00a0", "")
-    v = v.replace(".", "").replace(",", ".")  # 1.234,56 -> 1234.56
-    try:
-        return round(float(v), 2)
-    except:
+    v = val.translate(_PRICE_DROP).strip()  # 1.234,56 € -> 1234.56 (strip: \t, \u202f, ...)
+    return round(float(v), 2) if _NUM_RX.fullmatch(v) else None
+
+def product_key(pconf: dict) -> str:
+    """Chave do produto no state: URL + nome (vários produtos podem partilhar o URL)."""
+    return f"{pconf['url']}|{pconf.get('name') or pconf['url']}"
+
+def migrate_state(state: dict, products: list[dict]):
+    """Converte registos antigos (chave = URL) para a chave por produto."""
+    for p in products:
+        old = state.get(p["url"])
+        if old and old.get("name") == (p.get("name") or p["url"]):
+            state.setdefault(product_key(p), old)
+    for p in products:
+        state.pop(p["url"], None)
+
+def reusable_record(pconf: dict, record: dict | None) -> bool:
+    """Um 304 só pode reaproveitar o registo se a config de extração não mudou
+    desde que foi gravado e se nenhum campo configurado ficou por extrair."""
+    if not record or record.get("config_fp") != pconf.get("_fingerprint"):
+        return False
+    for key in ("price", "stock"):
+        section = pconf.get(key) or {}
+        if (section.get("selector") or section.get("regex_full_html")) and record.get(key) is None:
+            return False
+    return True
+
+def page_validators(group: list[tuple[dict, dict | None]]) -> dict | None:
+    """ETag/Last-Modified de um URL, se todos os produtos que o usam tiverem um
+    registo reaproveitável com os mesmos valores; senão None (GET normal, sem 304)."""
+    if not all(reusable_record(pconf, record) for pconf, record in group):
+        return None
+    pairs = {(record.get("etag"), record.get("last_modified")) for _, record in group}
+    if len(pairs) != 1:
+        return None
+    etag, last_modified = pairs.pop()
+    if not (etag or last_modified):
         return None
+    return {"etag": etag, "last_modified": last_modified}
 
-def fetch_product(session: requests.Session, pconf: dict):
+async def fetch_page(session: aiohttp.ClientSession, url: str, validators: dict | None = None,
+                     anchors: list[bytes] | None = None, max_bytes: int = MAX_BYTES):
+    """Lê e faz parse de uma página. Devolve None se o servidor responder 304."""
+    # GET condicional: se a página não mudou desde a última leitura, o servidor
+    # responde 304 sem corpo e cada produto reaproveita o seu registo anterior
+    headers = dict(HEADERS)
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    async with await get_with_retry(session, url, headers=headers, timeout=TIMEOUT) as r:
+        if r.status == 304 and validators:
+            return None
+        r.raise_for_status()
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        html, truncated = await read_limited(r, anchors, max_bytes)
+    return {
+        "html": html,
+        "tree": LexborHTMLParser(html),
+        "selectors": {},  # selector -> texto, partilhado pelos produtos deste URL
+        "truncated": truncated,
+        "etag": etag,
+        "last_modified": last_modified,
+    }
+
+def extract_product(pconf: dict, page: dict | None, previous: dict | None = None):
     url = pconf["url"]
-    r = session.get(url, headers=HEADERS, timeout=60)
-    r.raise_for_status()
-    html = r.text
-    soup = BeautifulSoup(html, "lxml")
+    if page is None:
+        return {**previous, "name": pconf.get("name") or url, "unchanged": True}
+    html, tree = page["html"], page["tree"]
 
     price_cfg = pconf.get("price", {}) or {}
     stock_cfg = pconf.get("stock", {}) or {}
 
     # 1) tentar por selector
-    raw_price = extract_with_selector(soup, price_cfg.get("selector"), price_cfg.get("regex"))
-    raw_stock = extract_with_selector(soup, stock_cfg.get("selector"), stock_cfg.get("regex"))
+    raw_price = extract_with_selector(tree, price_cfg.get("selector"), price_cfg.get("_regex"), page["selectors"])
+    raw_stock = extract_with_selector(tree, stock_cfg.get("selector"), stock_cfg.get("_regex"), page["selectors"])
+
+    if page["truncated"]:
+        for key in ("price", "stock"):
+            sel = (pconf.get(key) or {}).get("selector")
+            if sel and page["selectors"].get(sel) is None:
+                print(f"[WARN] {pconf.get('name') or url}: selector '{sel}' ({key}) sem resultado "
+                      f"numa página lida só em parte ({page['truncated']}).")
 
     # 2) fallback por regex no HTML completo
     if not raw_price:
-        raw_price = extract_from_html(html, price_cfg.get("regex_full_html"))
+        raw_price = extract_from_html(html, price_cfg.get("_regex_full_html"), price_cfg.get("anchor"))
     if not raw_stock:
-        raw_stock = extract_from_html(html, stock_cfg.get("regex_full_html"))
+        raw_stock = extract_from_html(html, stock_cfg.get("_regex_full_html"), stock_cfg.get("anchor"))
 
     price = normalize_price(raw_price)
     stock = raw_stock if raw_stock else None
@@ -139,9 +491,15 @@ def fetch_product(session: requests.Session, pconf: dict):
         "name": pconf.get("name") or url,
         "price": price,
         "raw_price": raw_price,
-        "stock": stock
+        "stock": stock,
+        "etag": page["etag"],
+        "last_modified": page["last_modified"],
+        "config_fp": pconf.get("_fingerprint"),
     }
 
+def format_change(name: str, url: str, changes: list[str]) -> str:
+    return "".join(("**[", name, "]**\n", url, "\nAlterações: ", "; ".join(changes)))
+
 def diff_values(old: dict | None, new: dict):
     changes = []
     if old is None:
@@ -153,7 +511,7 @@ def diff_values(old: dict | None, new: dict):
         changes.append(f"stock: {old.get('stock')} → {new.get('stock')}")
     return changes
 
-def main():
+async def main_async():
     # valida env
     if not (MAUSER_USER and MAUSER_PASS):
         # Nota: por agora algumas páginas mostram preço/stock sem login;
@@ -162,40 +520,77 @@ def main():
     cfg = load_config()
     state = load_state()
 
-    with requests.Session() as s:
-        s.headers.update(HEADERS)
-
-        # LOGIN
-        ok = login_mauser(s, cfg)
+    connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=60, resolver=make_resolver(),
+                                     use_dns_cache=True, ttl_dns_cache=DNS_TTL)
+    async with aiohttp.ClientSession(connector=connector, headers=HEADERS) as s:
+        # LOGIN (em paralelo, resolve já o DNS de outros hosts: webhook e produtos
+        # fora do host do login, que o próprio login já resolve)
+        warm_urls = [p["url"] for p in cfg["products"]] + ([DISCORD_WEBHOOK] if DISCORD_WEBHOOK else [])
+        login_host = urlparse(cfg["login"]["login_page"]).hostname
+        ok, _ = await asyncio.gather(login_mauser(s, cfg), warm_dns(connector, warm_urls, {login_host}))
         if not ok:
-            send_discord_message(":warning: Falha no login ao fornecedor (Mauser). Verifica credenciais.")
+            await send_discord_message(s, ":warning: Falha no login ao fornecedor (Mauser). Verifica credenciais.")
             return
 
-        # LOOP produtos
+        # produtos em paralelo (o semáforo limita pedidos simultâneos ao fornecedor)
+        sem = asyncio.Semaphore(CONCURRENCY)
+
+        async def bounded(coro, limiter: AsyncLimiter | None = None):
+            # a vez no host é esperada antes do semáforo, para não prender
+            # vagas que outros hosts podiam usar
+            if limiter is not None:
+                await limiter.acquire()
+            async with sem:
+                return await coro
+
+        # agrupa por host (mais reaproveitamento keep-alive) e por URL: cada
+        # página é lida e parseada uma só vez por execução, mesmo com vários produtos
+        products = sorted(cfg["products"], key=lambda p: urlparse(p["url"]).netloc)
+        migrate_state(state, products)
+        by_url: dict[str, list[dict]] = {}
+        for p in products:
+            by_url.setdefault(p["url"], []).append(p)
+        # ritmo por host: 1 pedido a cada min_interval s, sem esperar pelo fim do anterior
+        min_interval = float(cfg.get("min_interval", MIN_INTERVAL) or 0)  # <= 0 desliga o limite
+        max_bytes = cfg.get("max_bytes", MAX_BYTES)
+        limiters = {host: AsyncLimiter(1, min_interval) for host in {urlparse(u).netloc for u in by_url}} \
+            if min_interval > 0 else {}
+        results = await asyncio.gather(
+            *[bounded(fetch_page(s, url, page_validators([(p, state.get(product_key(p))) for p in group]),
+                                 early_stop_anchors(group), max_bytes),
+                      limiters.get(urlparse(url).netloc))
+              for url, group in by_url.items()],
+            return_exceptions=True)
+        pages = dict(zip(by_url, results))
+
         changes_msgs = []
-        for p in cfg["products"]:
+        for p in products:
             try:
-                data = fetch_product(s, p)
-                pid = data["url"]  # chave
-                previous = state.get(pid)
-                changes = diff_values(previous, data)
-                state[pid] = data
-                if changes:
-                    msg = (f"**[{p.get('name') or 'Produto'}]**\n"
-                           f"{data['url']}\n"
-                           f"Alterações: " + "; ".join(changes))
-                    changes_msgs.append(msg)
-                time.sleep(1.0)
+                page = pages[p["url"]]
+                if isinstance(page, BaseException):
+                    raise page
+                data = extract_product(p, page, state.get(product_key(p)))
             except Exception as e:
                 err = f":x: Erro ao ler {p.get('name') or p.get('url')}: {e}"
                 print(err)
                 changes_msgs.append(err)
+                continue
+            data.pop("unchanged", None)  # 304: registo anterior reaproveitado
+            pid = product_key(p)  # chave
+            previous = state.get(pid)
+            changes = diff_values(previous, data)
+            state[pid] = data
+            if changes:
+                changes_msgs.append(format_change(p.get("name") or "Produto", data["url"], changes))
 
         save_state(state)
 
         content = (":bell: **Alterações detetadas (Mauser)**\n\n" + "\n\n".join(changes_msgs)) if changes_msgs \
                   else ":white_check_mark: Sem alterações em preço/stock (Mauser)."
-        send_discord_message(content)
+        await send_discord_message(s, content)
+
+def main():
+    asyncio.run(main_async())
 
 if __name__ == "__main__":
     main()